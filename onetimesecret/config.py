@@ -5,4 +5,5 @@ from dotenv import load_dotenv
 
 load_dotenv()
 salt = os.getenv("SALT")
-uri = os.getenv("MONGODB_URI")
\ No newline at end of file
+uri = os.getenv("MONGODB_URI")
+key_derivation_workers = int(os.getenv("KEY_DERIVATION_WORKERS") or os.cpu_count() or 1)
@@ -1,22 +1,57 @@
-from typing import Optional
+import asyncio
+from contextlib import suppress
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteConcernError, WriteError
 
 from onetimesecret.models import Secret
 
 
 class Repository:
-    def __init__(self, uri: str, db_name: str):
+    def __init__(
+            self,
+            uri: str,
+            db_name: str,
+            max_pool_size: int = 200,
+            min_pool_size: int = 10,
+            max_idle_time_ms: int = 300_000,
+            server_selection_timeout_ms: int = 5000,
+            max_insert_batch_size: int = 500
+    ):
         """
         Initializes a new instance of the Repository class.
 
         Args:
             uri (str): The URI for connecting to the MongoDB database.
             db_name (str): The name of the MongoDB database to connect to.
+            max_pool_size (int): The maximum number of connections kept in the client pool.
+            min_pool_size (int): The number of connections the client keeps open even when idle,
+                so the first requests do not pay for establishing them.
+            max_idle_time_ms (int): How long a pooled connection may stay idle before it is closed.
+            server_selection_timeout_ms (int): How long to wait for a suitable server before failing.
+            max_insert_batch_size (int): The maximum number of queued secrets written by a single insert_many call.
         """
-        self.__client = AsyncIOMotorClient(uri)
+        self.__client = AsyncIOMotorClient(
+            uri,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size,
+            maxIdleTimeMS=max_idle_time_ms,
+            serverSelectionTimeoutMS=server_selection_timeout_ms
+        )
         self.__db = self.__client[db_name]
         self.__collection = self.__db['secrets']
+        self.__max_insert_batch_size = max_insert_batch_size
+        self.__pending_inserts: Optional[asyncio.Queue] = None
+        self.__insert_writer: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self) -> AsyncIOMotorCollection:
+        """
+        The MongoDB collection where secrets are stored.
+        """
+        return self.__collection
 
     async def initialize_indexes(self):
         """
@@ -29,25 +64,93 @@ class Repository:
 
     async def close(self):
         """
-        Closes the connection to the MongoDB client.
+        Waits for queued inserts to be written, stops the background writer
+        and closes the connection to the MongoDB client.
         """
+        if self.__insert_writer is not None:
+            await self.__pending_inserts.join()
+            self.__insert_writer.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.__insert_writer
+            self.__insert_writer = None
         self.__client.close()
 
     async def create(self, secret: Secret) -> None:
         """
-        Inserts a new secret document into the collection. Uses the 'secret_key' field
-        as the '_id' field in the MongoDB document.
+        Inserts a new secret document into the collection. The 'secret_key' field is
+        serialized under its '_id' alias and becomes the MongoDB primary key.
+
+        The document is queued for a background writer that coalesces concurrent inserts
+        into a single insert_many call; this method returns once the document is written.
 
         Args:
-            secret (Secret): The secret object to be inserted, with fields 'id', 'secret', and 'expiration'.
+            secret (Secret): The secret object to be inserted, with fields 'secret_key', 'secret', and 'expiration'.
+
+        Raises:
+            pymongo.errors.DuplicateKeyError: If a secret with the same key already exists.
+            pymongo.errors.PyMongoError: If the write fails for any other reason.
         """
-        secret_dict = secret.model_dump()
-        secret_dict['_id'] = secret_dict.pop('secret_key')
-        await self.__collection.insert_one(secret_dict)
+        if self.__insert_writer is None:
+            self.__pending_inserts = asyncio.Queue()
+            self.__insert_writer = asyncio.ensure_future(self.__write_pending_inserts())
+
+        written = asyncio.get_running_loop().create_future()
+        await self.__pending_inserts.put((secret.model_dump(by_alias=True), written))
+        await written
+
+    async def __write_pending_inserts(self) -> None:
+        """
+        Drains the insert queue for the lifetime of the repository. Every document queued
+        while the previous batch was being written is sent in the next insert_many call,
+        so batches grow with load without delaying inserts when traffic is low.
+        """
+        while True:
+            batch = [await self.__pending_inserts.get()]
+            while len(batch) < self.__max_insert_batch_size and not self.__pending_inserts.empty():
+                batch.append(self.__pending_inserts.get_nowait())
+
+            await self.__insert_batch(batch)
+            for _ in batch:
+                self.__pending_inserts.task_done()
+
+    async def __insert_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        """
+        Writes a batch of documents with an unordered insert_many and resolves the future
+        of each document with its own outcome. Documents without a write error of their own
+        fail with the last write concern error if the server reported one.
+
+        Args:
+            batch (List[Tuple[Dict[str, Any], asyncio.Future]]): Documents paired with the futures their callers await.
+        """
+        errors: Dict[int, Exception] = {}
+        try:
+            await self.__collection.insert_many([document for document, _ in batch], ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get('writeErrors', []):
+                error_class = DuplicateKeyError if error['code'] == 11000 else WriteError
+                errors[error['index']] = error_class(error['errmsg'], error['code'], error)
+            write_concern_errors = exc.details.get('writeConcernErrors')
+            if write_concern_errors:
+                error = write_concern_errors[-1]
+                write_concern_error = WriteConcernError(error['errmsg'], error.get('code'), error)
+                for index in range(len(batch)):
+                    errors.setdefault(index, write_concern_error)
+        except Exception as exc:
+            errors = dict.fromkeys(range(len(batch)), exc)
+
+        for index, (_, written) in enumerate(batch):
+            if written.done():
+                continue
+            if index in errors:
+                written.set_exception(errors[index])
+            else:
+                written.set_result(None)
 
     async def get(self, secret_key: str) -> Optional[str]:
         """
         Retrieves a secret from the collection using the secret key (which is used as '_id').
+        Only the 'secret' field is fetched from the server. Secrets past their expiration are
+        treated as missing even if the TTL monitor has not removed them yet.
 
         Args:
             secret_key (str): The key of the secret to retrieve, which corresponds to '_id' in MongoDB.
@@ -55,14 +158,24 @@ class Repository:
         Returns:
             Optional[str]: The secret if found, otherwise None.
         """
-        secret = await self.__collection.find_one({"_id": secret_key})
+        secret = await self.__collection.find_one(
+            {"_id": secret_key, "expiration": {"$gt": datetime.utcnow()}},
+            projection={"secret": 1, "_id": 0}
+        )
         return secret["secret"] if secret else None
 
-    async def delete(self, secret_key: str) -> None:
+    async def pop(self, secret_key: str) -> Optional[str]:
         """
-        Deletes a secret from the collection using the secret key (which is used as '_id').
+        Atomically retrieves and deletes a secret from the collection in a single round-trip.
 
         Args:
-            secret_key (str): The key of the secret to delete, which corresponds to '_id' in MongoDB.
+            secret_key (str): The key of the secret to remove, which corresponds to '_id' in MongoDB.
+
+        Returns:
+            Optional[str]: The secret if it was still present and not expired, otherwise None.
         """
-        await self.__collection.delete_one({"_id": secret_key})
+        secret = await self.__collection.find_one_and_delete(
+            {"_id": secret_key, "expiration": {"$gt": datetime.utcnow()}},
+            projection={"secret": 1, "_id": 0}
+        )
+        return secret["secret"] if secret else None
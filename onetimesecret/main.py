@@ -1,11 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 
 from onetimesecret.services import SecretService
 from onetimesecret.models import PassphraseRequest, SecretRequest, SecretResponse, SecretKeyResponse
 from onetimesecret.database import Repository
-from onetimesecret.config import uri, salt
+from onetimesecret.config import key_derivation_workers, uri, salt
 
 
 @asynccontextmanager
@@ -14,8 +16,8 @@ async def lifespan(app: FastAPI):
     Manages the lifespan of the FastAPI application, including setting up and tearing down resources.
 
     This function is responsible for initializing the MongoDB repository, creating necessary indexes,
-    and setting up the SecretService. It also ensures that the database connection is properly closed
-    when the application shuts down.
+    and setting up the SecretService with its key derivation thread pool. It also ensures that the
+    database connection is closed and the thread pool is shut down when the application shuts down.
 
     Args:
         app (FastAPI): The FastAPI application instance.
@@ -27,12 +29,16 @@ async def lifespan(app: FastAPI):
     Ensures:
         - The MongoDB repository is properly initialized with the required indexes.
         - The SecretService is configured with the given salt and is attached to the application's state.
-        - The database connection is closed when the application is shut down.
+        - The database connection is closed and the key derivation thread pool is shut down
+          when the application is shut down.
     """
     repository = Repository(uri, "secret_db")
     await repository.initialize_indexes()
 
-    secret_service = SecretService(salt, repository)
+    key_derivation_executor = ThreadPoolExecutor(
+        max_workers=key_derivation_workers, thread_name_prefix="key-derivation"
+    )
+    secret_service = SecretService(salt, repository, key_derivation_executor)
 
     app.state.secret_service = secret_service
 
@@ -40,20 +46,19 @@ async def lifespan(app: FastAPI):
         yield
     finally:
         await repository.close()
+        key_derivation_executor.shutdown()
 
-app = FastAPI(lifespan=lifespan, title="One Time Secret")
+app = FastAPI(lifespan=lifespan, title="One Time Secret", default_response_class=ORJSONResponse)
 
 
 @app.post("/generate", response_model=SecretKeyResponse)
-async def generate_secret(
-        request: SecretRequest,
-        secret_service: SecretService = Depends(lambda: app.state.secret_service)
-) -> SecretKeyResponse:
+async def generate_secret(request: Request, payload: SecretRequest) -> SecretKeyResponse:
     """
     Endpoint to generate a new secret.
 
     Args:
-        request (SecretRequest): The request object containing the secret content and passphrase.
+        request (Request): The incoming request, used to reach the SecretService on the application state.
+        payload (SecretRequest): The request body containing the secret content and passphrase.
 
     Returns:
         SecretKeyResponse: Response object containing the generated secret key.
@@ -62,22 +67,20 @@ async def generate_secret(
         HTTPException: If the request data is invalid or secret generation fails.
     """
 
-    secret_key = await secret_service.generate_secret(request.secret, request.passphrase)
-    return SecretKeyResponse(secret_key=secret_key)
+    secret_service: SecretService = request.app.state.secret_service
+    secret_key = await secret_service.generate_secret(payload.secret, payload.passphrase)
+    return SecretKeyResponse.model_construct(secret_key=secret_key)
 
 
 @app.post("/secrets/{secret_key}", response_model=SecretResponse)
-async def get_secret(
-        secret_key: str,
-        request: PassphraseRequest,
-        secret_service: SecretService = Depends(lambda: app.state.secret_service)
-) -> SecretResponse:
+async def get_secret(request: Request, secret_key: str, payload: PassphraseRequest) -> SecretResponse:
     """
     Endpoint to retrieve a secret using a secret key.
 
     Args:
+        request (Request): The incoming request, used to reach the SecretService on the application state.
         secret_key (str): The unique key of the secret to retrieve.
-        request (PassphraseRequest): The request object containing the passphrase for decryption.
+        payload (PassphraseRequest): The request body containing the passphrase for decryption.
 
     Returns:
         SecretResponse: Response object containing the decrypted secret.
@@ -86,5 +89,6 @@ async def get_secret(
         HTTPException: If the secret is not found or the passphrase is incorrect.
     """
 
-    secret = await secret_service.get_secret(secret_key, request.passphrase)
-    return SecretResponse(secret=secret)
+    secret_service: SecretService = request.app.state.secret_service
+    secret = await secret_service.get_secret(secret_key, payload.passphrase)
+    return SecretResponse.model_construct(secret=secret)
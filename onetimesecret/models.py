@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Secret(BaseModel):
@@ -8,12 +8,15 @@ class Secret(BaseModel):
     Represents a secret stored in the database.
 
     Attributes:
-        secret_key (str): A unique identifier for the secret.
+        secret_key (str): A unique identifier for the secret. Serialized as '_id' so it maps
+            directly onto the MongoDB primary key.
         secret (str): The encrypted content of the secret.
         expiration (datetime): The date and time when the secret expires.
     """
-    secret_key: str
-    secret: str
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
+    secret_key: str = Field(serialization_alias='_id')
+    secret: str = Field(repr=False)
     expiration: datetime
 
 
@@ -25,8 +28,10 @@ class SecretRequest(BaseModel):
         secret (str): The content of the secret to be stored.
         passphrase (str): The passphrase used to encrypt the secret.
     """
-    secret: str
-    passphrase: str
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
+    secret: str = Field(max_length=65536)
+    passphrase: str = Field(max_length=1024)
 
 
 class PassphraseRequest(BaseModel):
@@ -36,7 +41,9 @@ class PassphraseRequest(BaseModel):
     Attributes:
         passphrase (str): The passphrase used to decrypt the secret.
     """
-    passphrase: str
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
+    passphrase: str = Field(max_length=1024)
 
 
 class SecretKeyResponse(BaseModel):
@@ -46,6 +53,8 @@ class SecretKeyResponse(BaseModel):
     Attributes:
         secret_key (str): The generated secret key.
     """
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     secret_key: str
 
 
@@ -56,4 +65,6 @@ class SecretResponse(BaseModel):
     Attributes:
         secret (str): The decrypted secret.
     """
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     secret: str
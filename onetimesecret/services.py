@@ -1,4 +1,6 @@
-import uuid
+import asyncio
+import secrets
+from concurrent.futures import Executor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -17,22 +19,28 @@ class SecretService:
     Attributes:
         salt (bytes): The salt used for key derivation.
         repository (Repository): The repository where secrets are stored.
+        key_derivation_executor (Optional[Executor]): The executor that runs key derivations.
     """
 
-    def __init__(self, salt: str, repository: 'Repository') -> None:
+    def __init__(self, salt: str, repository: 'Repository', key_derivation_executor: Optional[Executor] = None) -> None:
         """
         Initializes the SecretService with the provided salt and repository.
 
         Args:
             salt (str): The salt used for key derivation.
             repository (Repository): The repository instance for storing and retrieving secrets.
+            key_derivation_executor (Optional[Executor]): The executor that runs key derivations.
+                Defaults to the event loop's default executor.
         """
         self.salt = salt.encode()
         self.repository = repository
+        self.key_derivation_executor = key_derivation_executor
 
     async def generate_key(self, passphrase: str) -> bytes:
         """
         Generates a key for encryption based on the provided passphrase.
+        The key derivation is CPU-bound, so it runs on the key derivation executor
+        to keep the event loop free.
 
         Args:
             passphrase (str): The passphrase used for key derivation.
@@ -40,7 +48,9 @@ class SecretService:
         Returns:
             bytes: The generated encryption key.
         """
-        return generate_key_from_passphrase(passphrase.encode(), self.salt)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.key_derivation_executor, generate_key_from_passphrase, passphrase.encode(), self.salt
+        )
 
     async def generate_secret(self, secret: str, passphrase: str) -> str:
         """
@@ -55,7 +65,7 @@ class SecretService:
         """
         key = await self.generate_key(passphrase)
         encrypted_secret = encrypt(secret, key)
-        secret_key = str(uuid.uuid4())
+        secret_key = secrets.token_urlsafe(16)
         secret_instance = Secret(
             secret_key=secret_key,
             secret=encrypted_secret,
@@ -94,5 +104,9 @@ class SecretService:
                 detail="Invalid input data"
             )
 
-        await self.repository.delete(secret_key)
+        if await self.repository.pop(secret_key) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="There is no such secret"
+            )
         return decrypted_secret
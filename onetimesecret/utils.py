@@ -1,11 +1,19 @@
+import os
 from base64 import urlsafe_b64decode, urlsafe_b64encode
 
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 
+NONCE_SIZE = 12
+KDF_ALGORITHM = hashes.SHA256()
+KDF_BACKEND = default_backend()
+
+
 def generate_key_from_passphrase(passphrase: bytes, salt: bytes) -> bytes:
     """
     Generates a cryptographic key from a passphrase and salt using PBKDF2 with HMAC-SHA256.
@@ -21,34 +29,50 @@ def generate_key_from_passphrase(passphrase: bytes, salt: bytes) -> bytes:
         TypeError: If the passphrase or salt are not of type 'bytes'.
     """
     kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
+        algorithm=KDF_ALGORITHM,
         length=32,
         salt=salt,
         iterations=100000,
-        backend=default_backend()
+        backend=KDF_BACKEND
     )
     key = kdf.derive(passphrase)
     return urlsafe_b64encode(key)
 
 
+def get_cipher(key: bytes) -> AESGCM:
+    """
+    Returns an AES-256-GCM cipher for the given key.
+
+    Args:
+        key (bytes): The encryption key, derived from the passphrase and encoded in URL-safe base64 format.
+
+    Returns:
+        AESGCM: The cipher bound to the key.
+
+    Raises:
+        ValueError: If the decoded key is not a valid AES key length.
+    """
+    return AESGCM(urlsafe_b64decode(key))
+
+
 def encrypt(secret: str, key: bytes) -> str:
     """
-    Encrypts a secret using the provided key.
+    Encrypts a secret with AES-256-GCM using the provided key and a random nonce.
 
     Args:
         secret (str): The plaintext secret data to be encrypted.
         key (bytes): The encryption key, derived from the passphrase.
 
     Returns:
-        str: The encrypted secret, encoded in URL-safe base64 format.
+        str: The nonce followed by the ciphertext and authentication tag, encoded in URL-safe base64 format.
 
     Raises:
         TypeError: If the secret is not a string or the key is not of type 'bytes'.
-        cryptography.fernet.InvalidToken: If the key is invalid.
+        ValueError: If the key is invalid.
     """
-    f = Fernet(key)
-    encrypted_secret = f.encrypt(secret.encode())
-    return urlsafe_b64encode(encrypted_secret).decode()
+    nonce = os.urandom(NONCE_SIZE)
+    encrypted_secret = get_cipher(key).encrypt(nonce, secret.encode(), None)
+    return urlsafe_b64encode(nonce + encrypted_secret).decode()
 
 
 def decrypt(encrypted_secret: str, key: bytes) -> str:
@@ -66,6 +90,9 @@ def decrypt(encrypted_secret: str, key: bytes) -> str:
         cryptography.fernet.InvalidToken: If the key is incorrect or the encrypted data has been tampered with.
         TypeError: If the encrypted_secret is not a string or the key is not of type 'bytes'.
     """
-    f = Fernet(key)
     encrypted_secret_bytes = urlsafe_b64decode(encrypted_secret)
-    return f.decrypt(encrypted_secret_bytes).decode()
+    nonce, encrypted_secret_bytes = encrypted_secret_bytes[:NONCE_SIZE], encrypted_secret_bytes[NONCE_SIZE:]
+    try:
+        return get_cipher(key).decrypt(nonce, encrypted_secret_bytes, None).decode()
+    except InvalidTag:
+        raise InvalidToken from None
@@ -0,0 +1,81 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from onetimesecret.config import uri
+from onetimesecret.database import Repository
+from onetimesecret.main import app
+from onetimesecret.services import SecretService
+from onetimesecret.utils import generate_key_from_passphrase
+
+
+transport = ASGITransport(app=app)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    """
+    Fixture that pins the AnyIO backend to asyncio for the whole test session.
+
+    Motor runs on asyncio, and a session-wide backend lets async fixtures be shared across test modules.
+    """
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def async_client():
+    """
+    Fixture that provides a single `AsyncClient` bound to the FastAPI application for the whole test session.
+
+    Reusing the client avoids rebuilding the connection pool in every test, and the module-level
+    ASGI transport is shared by any client built on it.
+    """
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.fixture(scope="session")
+async def setup_real_service():
+    """
+    Fixture that sets up and tears down the real secret service with MongoDB for testing.
+
+    Sets up a real `SecretService` instance connected to a MongoDB test database once per session
+    and caches the collection's index information on the application state.
+    Tears down the service and closes the database connection after all tests are done.
+    """
+    test_db_uri = uri
+    test_db_name = "test_db"
+
+    repository = Repository(test_db_uri, test_db_name)
+    await repository.initialize_indexes()
+
+    secret_service = SecretService(salt="test_salt", repository=repository)
+    app.state.secret_service = secret_service
+    app.state.indexes = await repository.collection.index_information()
+
+    yield
+
+    await repository.close()
+    del app.state.secret_service
+    del app.state.indexes
+
+
+@pytest.fixture(scope="session")
+def encryption_key() -> bytes:
+    """
+    Fixture that derives the encryption key for the test passphrase and salt once per session.
+
+    Returns:
+        bytes: The derived key.
+    """
+    return generate_key_from_passphrase(b"my_secret_passphrase", b"my_secret_salt")
+
+
+@pytest.fixture(scope="session")
+def wrong_encryption_key() -> bytes:
+    """
+    Fixture that derives a key from a different passphrase and the same salt once per session.
+
+    Returns:
+        bytes: The derived key.
+    """
+    return generate_key_from_passphrase(b"wrong_passphrase", b"my_secret_salt")
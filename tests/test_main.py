@@ -1,187 +1,330 @@
+import asyncio
+import orjson
 import pytest
+import secrets
+from datetime import datetime, timedelta
+from fastapi import Request
 from httpx import AsyncClient
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
 from typing import Dict
 
-from onetimesecret.main import app
-from onetimesecret.services import SecretService
-from onetimesecret.database import Repository
 from onetimesecret.config import uri
+from onetimesecret.database import Repository
+from onetimesecret.main import app, generate_secret, get_secret
+from onetimesecret.models import PassphraseRequest, Secret, SecretRequest
 
 
-@pytest.fixture(scope="module")
-async def setup_real_service():
-    """
-    Fixture that sets up and tears down the real secret service with MongoDB for testing.
+pytestmark = pytest.mark.slow
 
-    Sets up a real `SecretService` instance connected to a MongoDB test database.
-    Tears down the service and closes the database connection after tests are done.
-    """
-    test_db_uri = uri
-    test_db_name = "test_db"
-
-    repository = Repository(test_db_uri, test_db_name)
-    await repository.initialize_indexes()
+JSON_HEADERS = {"content-type": "application/json"}
 
-    secret_service = SecretService(salt="test_salt", repository=repository)
-    app.state.secret_service = secret_service
 
-    yield
+@pytest.fixture
+def app_request() -> Request:
+    """
+    Fixture that provides a minimal request bound to the application, for calling route handlers directly.
 
-    await repository.close()
-    del app.state.secret_service
+    Returns:
+        Request: A request whose `app` is the FastAPI application under test.
+    """
+    return Request({"type": "http", "app": app})
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def secret_data() -> Dict[str, Dict[str, str]]:
     """
-    Fixture that provides various secret data for testing.
+    Fixture that provides various secret data for testing, built once per module.
 
     Returns:
         Dict[str, Dict[str, str]]: A dictionary containing different test cases for secrets.
     """
+    correct = {"secret": "test_secret", "passphrase": "test_passphrase", "secret_key": "secret_key"}
     return {
-        "correct": {"secret": "test_secret", "passphrase": "test_passphrase", "secret_key": "secret_key"},
-        "incorrect_passphrase": {"secret": "test_secret", "passphrase": "wrong_passphrase", "secret_key": "secret_key"},
-        "incorrect_secret_key": {"secret": "test_secret", "passphrase": "test_passphrase", "secret_key": "invalid_key"},
-        "incorrect_both": {"secret": "test_secret", "passphrase": "wrong_passphrase", "secret_key": "invalid_key"}
+        "correct": correct,
+        "incorrect_passphrase": {**correct, "passphrase": "wrong_passphrase"},
+        "incorrect_secret_key": {**correct, "secret_key": "invalid_key"},
+        "incorrect_both": {**correct, "passphrase": "wrong_passphrase", "secret_key": "invalid_key"}
     }
 
 
-@pytest.mark.anyio
-async def test_generate_secret(setup_real_service: None, secret_data: Dict[str, Dict[str, str]]) -> None:
+@pytest.fixture(scope="module")
+def generate_payload(secret_data: Dict[str, Dict[str, str]]) -> bytes:
     """
-    Tests the generation of a secret with the real service.
+    Fixture that provides the JSON body for generating the correct secret, serialized once per module.
 
     Args:
-        setup_real_service (None): Fixture that sets up the real service.
         secret_data (Dict[str, Dict[str, str]]): Fixture that provides secret data for testing.
+
+    Returns:
+        bytes: The serialized request body for the `/generate` endpoint.
     """
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        response = await ac.post("/generate", json=secret_data["correct"])
-    assert response.status_code == 200
-    assert "secret_key" in response.json()
+    correct = secret_data["correct"]
+    return orjson.dumps({"secret": correct["secret"], "passphrase": correct["passphrase"]})
+
+
+def make_secret(secret_key: str, secret: str = "stored_secret", expires_in: int = 60) -> Secret:
+    """
+    Builds a secret for storing directly through a repository, bypassing key derivation and encryption.
+
+    Args:
+        secret_key (str): The key of the secret.
+        secret (str): The stored content of the secret.
+        expires_in (int): Seconds from now until the secret expires; negative for an already expired secret.
+
+    Returns:
+        Secret: The secret to store.
+    """
+    return Secret(secret_key=secret_key, secret=secret, expiration=datetime.utcnow() + timedelta(seconds=expires_in))
 
 
 @pytest.mark.anyio
-async def test_get_secret(setup_real_service: None, secret_data: Dict[str, Dict[str, str]]) -> None:
+async def test_generate_secret(
+    setup_real_service: None, app_request: Request, secret_data: Dict[str, Dict[str, str]]
+) -> None:
     """
-    Tests retrieving a secret with the correct key and passphrase using the real service.
+    Tests the generation of a secret with the real service by calling the route handler directly.
 
     Args:
         setup_real_service (None): Fixture that sets up the real service.
+        app_request (Request): Fixture that provides a request bound to the application.
         secret_data (Dict[str, Dict[str, str]]): Fixture that provides secret data for testing.
     """
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        generate_response = await ac.post("/generate", json=secret_data["correct"])
-        secret_key = generate_response.json()["secret_key"]
-
-        response = await ac.post(f"/secrets/{secret_key}", json={"passphrase": secret_data["correct"]["passphrase"]})
-    assert response.status_code == 200
-    assert response.json() == {"secret": secret_data["correct"]["secret"]}
+    response = await generate_secret(app_request, SecretRequest(**secret_data["correct"]))
+    assert response.secret_key
 
 
 @pytest.mark.anyio
-async def test_get_secret_with_incorrect_passphrase(
-    setup_real_service: None, secret_data: Dict[str, Dict[str, str]]
+async def test_generate_unique_secret_keys(
+    setup_real_service: None, async_client: AsyncClient, generate_payload: bytes
 ) -> None:
     """
-    Tests retrieving a secret with an incorrect passphrase using the real service.
+    Tests that concurrent secret generation succeeds and yields a distinct key for every request.
 
     Args:
         setup_real_service (None): Fixture that sets up the real service.
-        secret_data (Dict[str, Dict[str, str]]): Fixture that provides secret data for testing.
+        async_client (AsyncClient): Fixture that provides the shared HTTP client.
+        generate_payload (bytes): Fixture that provides the serialized `/generate` request body.
     """
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        generate_response = await ac.post("/generate", json=secret_data["correct"])
-        secret_key = generate_response.json()["secret_key"]
+    responses = await asyncio.gather(
+        *(async_client.post("/generate", content=generate_payload, headers=JSON_HEADERS) for _ in range(100))
+    )
 
-        response = await ac.post(f"/secrets/{secret_key}",
-                                 json={"passphrase": secret_data["incorrect_passphrase"]["passphrase"]})
-    assert response.status_code == 400
-    assert response.json() == {"detail": "Invalid input data"}
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.json()["secret_key"] for response in responses}) == 100
+
+
+@pytest.fixture(scope="module")
+async def generated_secret(setup_real_service: None, async_client: AsyncClient, generate_payload: bytes) -> str:
+    """
+    Fixture that generates a single secret shared by the retrieval error tests of the module.
+
+    Args:
+        setup_real_service (None): Fixture that sets up the real service.
+        async_client (AsyncClient): Fixture that provides the shared HTTP client.
+        generate_payload (bytes): Fixture that provides the serialized `/generate` request body.
+
+    Returns:
+        str: The key of the generated secret.
+    """
+    response = await async_client.post("/generate", content=generate_payload, headers=JSON_HEADERS)
+    return response.json()["secret_key"]
 
 
 @pytest.mark.anyio
-async def test_get_secret_with_incorrect_secret_key(
-    setup_real_service: None, secret_data: Dict[str, Dict[str, str]]
+async def test_get_secret(
+    setup_real_service: None, app_request: Request, secret_data: Dict[str, Dict[str, str]]
 ) -> None:
     """
-    Tests retrieving a secret with an incorrect secret key using the real service.
+    Tests retrieving a secret with the correct key and passphrase by calling the route handlers directly.
 
     Args:
         setup_real_service (None): Fixture that sets up the real service.
+        app_request (Request): Fixture that provides a request bound to the application.
         secret_data (Dict[str, Dict[str, str]]): Fixture that provides secret data for testing.
     """
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        await ac.post("/generate", json=secret_data["correct"])
+    generate_response = await generate_secret(app_request, SecretRequest(**secret_data["correct"]))
 
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        response = await ac.post(f"/secrets/{secret_data['incorrect_secret_key']['secret_key']}",
-                                 json={"passphrase": secret_data["correct"]["passphrase"]})
-    assert response.status_code == 404
-    assert response.json() == {"detail": "There is no such secret"}
+    response = await get_secret(
+        app_request,
+        generate_response.secret_key,
+        PassphraseRequest(passphrase=secret_data["correct"]["passphrase"])
+    )
+    assert response.secret == secret_data["correct"]["secret"]
 
 
 @pytest.mark.anyio
-async def test_get_secret_with_incorrect_both(
-    setup_real_service: None, secret_data: Dict[str, Dict[str, str]]
+@pytest.mark.parametrize("case, use_generated_key, status_code, detail", [
+    ("incorrect_passphrase", True, 400, "Invalid input data"),
+    ("incorrect_secret_key", False, 404, "There is no such secret"),
+    ("incorrect_both", False, 404, "There is no such secret"),
+])
+async def test_get_secret_with_incorrect_data(
+    async_client: AsyncClient,
+    generated_secret: str,
+    secret_data: Dict[str, Dict[str, str]],
+    case: str,
+    use_generated_key: bool,
+    status_code: int,
+    detail: str
 ) -> None:
     """
-    Tests retrieving a secret with both incorrect secret key and passphrase using the real service.
+    Tests retrieving a secret with an incorrect passphrase, secret key, or both using the real service.
+
+    A wrong passphrase does not consume the secret, so every case shares the single generated secret.
 
     Args:
-        setup_real_service (None): Fixture that sets up the real service.
+        async_client (AsyncClient): Fixture that provides the shared HTTP client.
+        generated_secret (str): Fixture that provides the key of a previously generated secret.
         secret_data (Dict[str, Dict[str, str]]): Fixture that provides secret data for testing.
+        case (str): The key of the `secret_data` entry to use.
+        use_generated_key (bool): Whether to request the generated secret instead of the case's secret key.
+        status_code (int): The expected HTTP status code.
+        detail (str): The expected error detail.
     """
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        await ac.post("/generate", json=secret_data["correct"])
+    secret_key = generated_secret if use_generated_key else secret_data[case]["secret_key"]
 
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        response = await ac.post(f"/secrets/{secret_data['incorrect_both']['secret_key']}",
-                                 json={"passphrase": secret_data["incorrect_both"]["passphrase"]})
-    assert response.status_code == 404
-    assert response.json() == {"detail": "There is no such secret"}
+    response = await async_client.post(f"/secrets/{secret_key}", json={"passphrase": secret_data[case]["passphrase"]})
+    assert response.status_code == status_code
+    assert response.json() == {"detail": detail}
 
 
 @pytest.mark.anyio
 async def test_generate_get_and_verify_secret_deletion(
-    setup_real_service: None, secret_data: Dict[str, Dict[str, str]]
+    setup_real_service: None,
+    async_client: AsyncClient,
+    secret_data: Dict[str, Dict[str, str]],
+    generate_payload: bytes
 ) -> None:
     """
     Tests generating, retrieving, and then verifying the deletion of a secret using the real service.
 
     Args:
         setup_real_service (None): Fixture that sets up the real service.
+        async_client (AsyncClient): Fixture that provides the shared HTTP client.
         secret_data (Dict[str, Dict[str, str]]): Fixture that provides secret data for testing.
+        generate_payload (bytes): Fixture that provides the serialized `/generate` request body.
     """
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        generate_response = await ac.post("/generate", json=secret_data["correct"])
-        secret_key = generate_response.json()["secret_key"]
+    generate_response = await async_client.post("/generate", content=generate_payload, headers=JSON_HEADERS)
+    secret_key = generate_response.json()["secret_key"]
 
-        response = await ac.post(f"/secrets/{secret_key}", json={"passphrase": secret_data["correct"]["passphrase"]})
+    response = await async_client.post(f"/secrets/{secret_key}",
+                                       json={"passphrase": secret_data["correct"]["passphrase"]})
     assert response.status_code == 200
     assert response.json() == {"secret": secret_data["correct"]["secret"]}
 
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        response = await ac.post(f"/secrets/{secret_key}", json={"passphrase": secret_data["correct"]["passphrase"]})
+    response = await async_client.post(f"/secrets/{secret_key}",
+                                       json={"passphrase": secret_data["correct"]["passphrase"]})
     assert response.status_code == 404
     assert response.json() == {"detail": "There is no such secret"}
 
 
 @pytest.mark.anyio
-async def test_ttl_index_creation():
+async def test_repository_pop_deletes_secret(setup_real_service: None) -> None:
     """
-    Test that verifies the TTL index on the 'expiration' field has been successfully created in the test MongoDB database.
+    Tests that popping a secret from the repository returns it once and removes it.
+
+    The secret is stored directly through the repository, so no key derivation or encryption is involved.
+
+    Args:
+        setup_real_service (None): Fixture that sets up the real service.
+    """
+    repository = app.state.secret_service.repository
+    secret_key = secrets.token_urlsafe(16)
+    await repository.create(make_secret(secret_key))
+
+    assert await repository.pop(secret_key) == "stored_secret"
+    assert await repository.get(secret_key) is None
+    assert await repository.pop(secret_key) is None
+
+
+@pytest.mark.anyio
+async def test_repository_ignores_expired_secret(setup_real_service: None) -> None:
+    """
+    Tests that a secret past its expiration reads as missing before the TTL monitor removes it.
+
+    Args:
+        setup_real_service (None): Fixture that sets up the real service.
+    """
+    repository = app.state.secret_service.repository
+    secret_key = secrets.token_urlsafe(16)
+    await repository.create(make_secret(secret_key, "expired_secret", expires_in=-60))
+
+    assert await repository.get(secret_key) is None
+    assert await repository.pop(secret_key) is None
+
+
+@pytest.mark.anyio
+async def test_repository_create_rejects_duplicate_key(setup_real_service: None) -> None:
+    """
+    Tests that of two concurrent inserts with the same key, one succeeds and the other raises `DuplicateKeyError`.
+
+    Args:
+        setup_real_service (None): Fixture that sets up the real service.
+    """
+    repository = app.state.secret_service.repository
+    secret_key = secrets.token_urlsafe(16)
+
+    results = await asyncio.gather(
+        repository.create(make_secret(secret_key)),
+        repository.create(make_secret(secret_key)),
+        return_exceptions=True
+    )
+
+    assert results.count(None) == 1
+    assert sum(isinstance(result, DuplicateKeyError) for result in results) == 1
+    assert await repository.pop(secret_key) == "stored_secret"
+
+
+@pytest.mark.anyio
+async def test_repository_create_fails_whole_batch() -> None:
+    """
+    Tests that an error that is not a per-document write error fails every insert of the batch.
+
+    The repository points at a port with no server, so insert_many raises `ServerSelectionTimeoutError`.
     """
-    client = AsyncIOMotorClient(uri)
-    db = client['test_db']
-    collection = db['secrets']
+    repository = Repository("mongodb://127.0.0.1:1", "test_db", server_selection_timeout_ms=100)
+
+    results = await asyncio.gather(
+        *(repository.create(make_secret(secrets.token_urlsafe(16))) for _ in range(3)),
+        return_exceptions=True
+    )
+    await repository.close()
+
+    assert all(isinstance(result, ServerSelectionTimeoutError) for result in results)
+
 
-    indexes = await collection.index_information()
+@pytest.mark.anyio
+async def test_repository_close_drains_pending_inserts(setup_real_service: None) -> None:
+    """
+    Tests that closing a repository writes the inserts still queued before it closes the client.
+
+    Args:
+        setup_real_service (None): Fixture that sets up the real service.
+    """
+    repository = Repository(uri, "test_db")
+    secret_keys = [secrets.token_urlsafe(16) for _ in range(3)]
+    inserts = [asyncio.ensure_future(repository.create(make_secret(secret_key))) for secret_key in secret_keys]
+    await asyncio.sleep(0)
+
+    await repository.close()
+
+    assert await asyncio.gather(*inserts) == [None] * 3
+    shared_repository = app.state.secret_service.repository
+    for secret_key in secret_keys:
+        assert await shared_repository.pop(secret_key) == "stored_secret"
+
+
+@pytest.mark.anyio
+async def test_ttl_index_creation(setup_real_service: None) -> None:
+    """
+    Test that verifies the TTL index on the 'expiration' field has been successfully created in the test MongoDB database.
+
+    Args:
+        setup_real_service (None): Fixture that sets up the real service.
+    """
+    indexes = app.state.indexes
 
     assert 'expiration_1' in indexes
 
     ttl_seconds = indexes['expiration_1'].get('expireAfterSeconds')
     assert ttl_seconds == 1
-    client.close()
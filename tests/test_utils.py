@@ -1,7 +1,7 @@
 import pytest
-from base64 import urlsafe_b64decode
-from cryptography.fernet import Fernet, InvalidToken
-from onetimesecret.utils import generate_key_from_passphrase, encrypt, decrypt
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from cryptography.fernet import InvalidToken
+from onetimesecret.utils import NONCE_SIZE, generate_key_from_passphrase, encrypt, decrypt
 
 
 def test_generate_key_from_passphrase():
@@ -19,7 +19,7 @@ def test_generate_key_from_passphrase():
     assert len(key) == 44
 
 
-def test_encrypt_decrypt():
+def test_encrypt_decrypt(encryption_key: bytes):
     """
     Test the encryption and decryption functions.
 
@@ -28,21 +28,17 @@ def test_encrypt_decrypt():
     decrypting the encrypted secret returns the original secret.
     """
     secret = "my_secret_data"
-    passphrase = b"my_secret_passphrase"
-    salt = b"my_secret_salt"
-
-    key = generate_key_from_passphrase(passphrase, salt)
 
-    encrypted_secret = encrypt(secret, key)
+    encrypted_secret = encrypt(secret, encryption_key)
 
     assert encrypted_secret != secret
 
-    decrypted_secret = decrypt(encrypted_secret, key)
+    decrypted_secret = decrypt(encrypted_secret, encryption_key)
 
     assert decrypted_secret == secret
 
 
-def test_decrypt_with_wrong_key():
+def test_decrypt_with_wrong_key(encryption_key: bytes, wrong_encryption_key: bytes):
     """
     Test decryption with a wrong key.
 
@@ -50,20 +46,14 @@ def test_decrypt_with_wrong_key():
     It verifies that encryption with one key and decryption with another key fails.
     """
     secret = "my_secret_data"
-    passphrase = b"my_secret_passphrase"
-    salt = b"my_secret_salt"
-    wrong_passphrase = b"wrong_passphrase"
-
-    key = generate_key_from_passphrase(passphrase, salt)
-    wrong_key = generate_key_from_passphrase(wrong_passphrase, salt)
 
-    encrypted_secret = encrypt(secret, key)
+    encrypted_secret = encrypt(secret, encryption_key)
 
     with pytest.raises(InvalidToken):
-        decrypt(encrypted_secret, wrong_key)
+        decrypt(encrypted_secret, wrong_encryption_key)
 
 
-def test_encrypt_output_is_base64():
+def test_encrypt_output_is_base64(encryption_key: bytes):
     """
     Test that the encrypted output is a valid base64 string.
 
@@ -71,14 +61,37 @@ def test_encrypt_output_is_base64():
     It verifies that decoding the encrypted secret with `urlsafe_b64decode` does not raise an exception.
     """
     secret = "my_secret_data"
-    passphrase = b"my_secret_passphrase"
-    salt = b"my_secret_salt"
 
-    key = generate_key_from_passphrase(passphrase, salt)
-
-    encrypted_secret = encrypt(secret, key)
+    encrypted_secret = encrypt(secret, encryption_key)
 
     try:
         urlsafe_b64decode(encrypted_secret)
     except Exception as e:
-        pytest.fail(f"Encrypted secret is not valid base64: {e}")
\ No newline at end of file
+        pytest.fail(f"Encrypted secret is not valid base64: {e}")
+
+
+def test_encrypt_uses_random_nonce(encryption_key: bytes):
+    """
+    Test that encrypting the same secret twice gives different ciphertexts.
+
+    Every call draws a fresh random nonce, so equal plaintexts must not produce equal ciphertexts.
+    """
+    secret = "my_secret_data"
+
+    assert encrypt(secret, encryption_key) != encrypt(secret, encryption_key)
+
+
+def test_decrypt_tampered_ciphertext(encryption_key: bytes):
+    """
+    Test decryption of a tampered ciphertext.
+
+    This test ensures that flipping a single byte of the ciphertext makes authentication fail,
+    so `decrypt` raises an `InvalidToken` exception.
+    """
+    secret = "my_secret_data"
+
+    encrypted_secret = bytearray(urlsafe_b64decode(encrypt(secret, encryption_key)))
+    encrypted_secret[NONCE_SIZE] ^= 1
+
+    with pytest.raises(InvalidToken):
+        decrypt(urlsafe_b64encode(bytes(encrypted_secret)).decode(), encryption_key)
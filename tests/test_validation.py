@@ -0,0 +1,23 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("url, payload", [
+    ("/generate", {"secret": "s" * 65537, "passphrase": "test_passphrase"}),
+    ("/generate", {"secret": "test_secret", "passphrase": "p" * 1025}),
+    ("/secrets/secret_key", {"passphrase": "p" * 1025}),
+])
+async def test_oversized_fields_are_rejected(async_client: AsyncClient, url: str, payload: dict) -> None:
+    """
+    Tests that a secret or passphrase longer than its limit is rejected with 422.
+
+    Validation fails before the route handler runs, so no database is needed.
+
+    Args:
+        async_client (AsyncClient): Fixture that provides the shared HTTP client.
+        url (str): The endpoint to post to.
+        payload (dict): The request body with one oversized field.
+    """
+    response = await async_client.post(url, json=payload)
+    assert response.status_code == 422